@@ -4,51 +4,122 @@ Run: streamlit run dashboard.py
 """
 import pathlib
 import streamlit as st
+import numpy as np
 import pandas as pd
 import sqlite3
 import altair as alt
+import duckdb
+import pyarrow as pa
 from pathlib import Path
 
 DATA_DIR = Path("data")
 PARQUET_FILE = DATA_DIR / "books_clean.parquet"
 DB_PATH = DATA_DIR / "books.db"
 
+# Only the columns the dashboard actually renders - skip I/O for the rest
+USED_COLS = ["title", "product_page_url", "category", "price",
+             "availability", "rating", "description", "image_url"]
+
 st.set_page_config(layout="wide", page_title="Books Dashboard")
-@st.cache_data(ttl=600)
 
+# cache_resource returns the same DataFrame by reference on reruns,
+# avoiding the full pickle round-trip cache_data does per hit
+@st.cache_resource(ttl=600)
 def load_data():
     """Load cleaned data from Parquet or SQLite database."""
     # Prefer parquet if available, else read from sqlite
     if PARQUET_FILE.exists():
-        df = pd.read_parquet(PARQUET_FILE)
+        # keep the Arrow arrays parquet already holds instead of
+        # materializing NumPy blocks (big win for the string columns)
+        df = pd.read_parquet(PARQUET_FILE, columns=USED_COLS, dtype_backend='pyarrow')
     elif DB_PATH.exists():
         conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql("SELECT * FROM books", conn)
+        df = pd.read_sql(f"SELECT {','.join(USED_COLS)} FROM books", conn, dtype_backend='pyarrow')
         conn.close()
-    
-    df["category"] = df['category'].fillna("Unknown")
+
+    # categorical codes make isin/groupby compare small ints, not strings
+    df["category"] = df['category'].fillna("Unknown").astype('category')
     df['price'] = pd.to_numeric(df['price'], errors='coerce')
     df['rating'] = pd.to_numeric(df['rating'], errors='coerce')
-    return df
 
-df = load_data()
+    # widget bounds computed once here, not rescanned on every rerun
+    price_bounds = (float(df['price'].min()), float(df['price'].max()))
+    rating_seen = df['rating'].notna().any()
+    rating_bounds = (
+        int(df['rating'].min()) if rating_seen else 0,
+        int(df['rating'].max()) if rating_seen else 5,
+    )
+    return df, price_bounds, rating_bounds
+
+@st.cache_resource
+def get_duck():
+    """DuckDB connection with a 'books' view over the cleaned parquet file."""
+    con = duckdb.connect()
+    # mirror load_data's fillna: NULL categories must match the 'Unknown'
+    # entry the sidebar offers, and = ANY(...) never matches SQL NULL
+    con.execute(
+        f"CREATE VIEW books AS SELECT * REPLACE (COALESCE(category, 'Unknown') AS category) "
+        f"FROM read_parquet('{PARQUET_FILE}')"
+    )
+    return con
+
+
+df, price_bounds, rating_bounds = load_data()
+con = get_duck() if PARQUET_FILE.exists() else None
+
+_FILTER_SQL = "category = ANY(?) AND price BETWEEN ? AND ? AND rating >= ?"
+
+
+@st.cache_data
+def compute_view(cats, lo, hi, min_r):
+    """Filtered rows plus per-category mean price for the sidebar state.
+
+    Cached on the (categories, price range, min rating) tuple, so nudging a
+    slider back to a value already seen is an O(1) lookup. With parquet
+    present the work runs in DuckDB, which pushes the WHERE predicates down
+    to parquet row-group statistics; otherwise fall back to a pandas mask.
+    """
+    if con is not None:
+        sub = con.execute(
+            f"SELECT * FROM books WHERE {_FILTER_SQL}",
+            [list(cats), lo, hi, min_r]
+        ).df()
+        agg = con.execute(
+            f"SELECT category, AVG(price) AS price FROM books "
+            f"WHERE {_FILTER_SQL} GROUP BY category ORDER BY price DESC",
+            [list(cats), lo, hi, min_r]
+        ).df()
+    else:
+        mask = (
+            (df["category"].isin(cats)) &
+            (df["price"].between(lo, hi)) &
+            (df["rating"] >= min_r)
+        )
+        sub = df.loc[mask]
+        # aggregate via PyArrow's C++ hash-aggregate kernel: one pass over
+        # two columns, no pandas Index construction, and no groupby-mean
+        # slowdown on the arrow-backed dtypes
+        tbl = pa.Table.from_pandas(sub[["category", "price"]], preserve_index=False)
+        agg = (
+            tbl.group_by(["category"]).aggregate([("price", "mean")])
+            .rename_columns(["category", "price"])
+            .to_pandas()
+            .sort_values("price", ascending=False)
+        )
+    return sub, agg
+
 
 # Sidebar - filters
 st.sidebar.header("Filters")
 categories = sorted(df["category"].dropna().unique())
 selected_cats = st.sidebar.multiselect("Category", categories, default=categories[:6])
-min_price, max_price = float(df["price"].min()), float(df["price"].max())
+min_price, max_price = price_bounds
 price_range = st.sidebar.slider("Price range", min_price, max_price, (min_price, max_price))
-min_rating = int(df["rating"].min()) if df["rating"].notnull().any() else 0
-max_rating = int(df["rating"].max()) if df["rating"].notnull().any() else 5
+min_rating, max_rating = rating_bounds
 rating_select = st.sidebar.slider("Min rating", min_rating, max_rating, min_rating)
 
-# Apply filters
-filtered = df[
-    (df["category"].isin(selected_cats)) &
-    (df["price"].between(price_range[0], price_range[1])) &
-    (df["rating"] >= rating_select)
-].copy()
+# Apply filters (tuple args so the cache key is hashable)
+filtered, avg_by_cat = compute_view(tuple(selected_cats), price_range[0], price_range[1], rating_select)
 
 # Top metrics
 col1, col2, col3 = st.columns(3)
@@ -58,7 +129,6 @@ col3.metric("Avg rating", f"{filtered['rating'].mean():.2f}" if not filtered.emp
 
 # Charts
 st.markdown("### Average price by category")
-avg_by_cat = filtered.groupby("category", as_index=False)["price"].mean().sort_values("price", ascending=False)
 bar = alt.Chart(avg_by_cat).mark_bar().encode(
     x=alt.X("price:Q", title="Average Price"),
     y=alt.Y("category:N", sort="-x", title="Category"),
@@ -67,10 +137,16 @@ bar = alt.Chart(avg_by_cat).mark_bar().encode(
 st.altair_chart(bar, use_container_width=True)
 
 st.markdown("### Price distribution")
-hist = alt.Chart(filtered).mark_bar().encode(
-    alt.X("price:Q", bin=alt.Bin(maxbins=40)),
-    y='count()',
-    tooltip=[alt.Tooltip("count()", title="Count")]
+# Bin server-side: the browser gets a 40-row (bin, count) table instead of
+# every filtered row plus a Vega-side binning transform.
+bin_edges = np.linspace(price_range[0], price_range[1], 41)
+counts, edges = np.histogram(filtered["price"].dropna(), bins=bin_edges)
+hist_df = pd.DataFrame({"price_left": edges[:-1], "price_right": edges[1:], "count": counts})
+hist = alt.Chart(hist_df).mark_bar().encode(
+    x=alt.X("price_left:Q", title="Price"),
+    x2="price_right:Q",
+    y=alt.Y("count:Q", title="Count"),
+    tooltip=[alt.Tooltip("count:Q", title="Count")]
 ).properties(height=250)
 st.altair_chart(hist, use_container_width=True)
 
@@ -79,15 +155,21 @@ st.dataframe(filtered.head(200))
 
 # Option: show book images and links for first N items
 st.markdown("### Sample books")
-for idx, row in filtered.head(10).iterrows():
-    cols = st.columns([1, 6])
-    with cols[0]:
-        if pd.notna(row.get("image_url")):
-            st.image(row["image_url"], width=80)
-    with cols[1]:
-        st.write(f"**{row['title']}**")
-        st.write(f"Category: {row.get('category','')}, Price: £{row.get('price')}, Rating: {row.get('rating')}")
-        st.write(f"[Product page]({row.get('product_page_url')})")
+# One Arrow-serialized dataframe instead of per-row columns/image/write
+# widgets (each of which is its own websocket message)
+sample = filtered.head(10)[["image_url", "title", "category", "price", "rating", "product_page_url"]]
+st.dataframe(
+    sample,
+    column_config={
+        "image_url": st.column_config.ImageColumn("Cover"),
+        "title": st.column_config.TextColumn("Title"),
+        "category": st.column_config.TextColumn("Category"),
+        "price": st.column_config.NumberColumn("Price", format="£%.2f"),
+        "rating": st.column_config.NumberColumn("Rating"),
+        "product_page_url": st.column_config.LinkColumn("Product page"),
+    },
+    hide_index=True,
+)
 
 st.markdown("---")
 st.caption("Data source: books.toscrape.com (practice site).")
@@ -7,14 +7,19 @@ Improvements over original:
  - Logs full exceptions and stack traces
  - Does not crash on single page/product failure (continues and saves partial results)
  - Exponential backoff retry for requests
- - Safe partial JSON flush so progress isn't lost
+ - Append-only JSONL log so progress isn't lost (O(1) per item, crash-safe)
  - Helpful debug curl instructions when a page can't be fetched
+ - asyncio + aiohttp fetch layer: one event loop multiplexes all HTTP I/O
+   behind a bounded semaphore, keep-alive connections reused
+ - selectolax (Lexbor) for HTML parsing - much cheaper per node than BeautifulSoup
 """
-import requests
-from bs4 import BeautifulSoup
-import time
+import asyncio
+import aiohttp
+import orjson
+from selectolax.parser import HTMLParser
+import pyarrow as pa
+import pyarrow.parquet as pq
 import random
-import json
 import csv
 import logging
 import traceback
@@ -26,8 +31,30 @@ from tqdm import tqdm
 BASE = "http://books.toscrape.com/"
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
-RAW_JSON = DATA_DIR / "raw_books.json"
+RAW_JSONL = DATA_DIR / "raw_books.jsonl"
+RAW_PARQUET = DATA_DIR / "raw_books.parquet"
 RAW_CSV = DATA_DIR / "raw_books.csv"
+CONCURRENCY = 16
+
+# Everything comes off the page as text; typing happens in transform_and_load.
+RAW_SCHEMA = pa.schema([
+    ("title", pa.string()),
+    ("product_page_url", pa.string()),
+    ("price_text", pa.string()),
+    ("availability_text", pa.string()),
+    ("rating_text", pa.string()),
+    ("image_url", pa.string()),
+    ("category", pa.string()),
+    ("description", pa.string()),
+    ("UPC", pa.string()),
+    ("Product Type", pa.string()),
+    ("Price (excl. tax)", pa.string()),
+    ("Price (incl. tax)", pa.string()),
+    ("Tax", pa.string()),
+    ("Availability", pa.string()),
+    ("Number of reviews", pa.string()),
+    ("fetched_url", pa.string()),
+])
 
 HEADERS = {
     "User-Agent": "books-scraper-bot/1.0 (+https://example.com/contact) - learning only"
@@ -39,47 +66,50 @@ logging.basicConfig(
 )
 
 
-def get_soup_and_url(url, max_retries=4, backoff_factor=1.0, timeout=10):
+async def fetch(session, url, semaphore, max_retries=4, backoff_factor=1.0, timeout=10):
     """
-    Fetch a page and return (soup, final_url) or (None, None) on failure.
-    Uses exponential backoff on retries.
+    Fetch a page and return (final_url, html) or (None, None) on failure.
+    Uses exponential backoff on retries; the semaphore bounds concurrency.
     """
     delay = backoff_factor
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(url, headers=HEADERS, timeout=timeout)
-            # Note: don't .raise_for_status() immediately - some sites return 403 etc.
-            if resp.status_code != 200:
-                logging.warning(f"Non-200 status {resp.status_code} for {url}")
-                # still try a couple more times
-            else:
-                soup = BeautifulSoup(resp.text, "lxml")
-                return soup, resp.url  # use resp.url as the base for joins
+            async with semaphore:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                    # Note: don't raise_for_status() immediately - some sites return 403 etc.
+                    if resp.status != 200:
+                        logging.warning(f"Non-200 status {resp.status} for {url}")
+                        # still try a couple more times
+                    else:
+                        return str(resp.url), await resp.text()  # use resp.url as the base for joins
         except Exception as e:
             logging.warning(f"Request exception for {url}: {e} (attempt {attempt}/{max_retries})")
-        time.sleep(delay * (1 + random.random()))
+        await asyncio.sleep(delay * (1 + random.random()))
         delay *= 2  # exponential backoff
     logging.error(f"Failed to fetch {url} after {max_retries} attempts. Try: curl -I {url}")
     return None, None
 
 
+def txt(node, sel, default=""):
+    """Stripped text of the first match for sel under node, or default."""
+    n = node.css_first(sel)
+    return n.text().strip() if n else default
+
+
 def parse_list_item(article, page_base_url):
     """Extract brief listing info and product page absolute URL using page_base_url."""
-    h3 = article.find("h3")
-    a = h3.find("a")
-    title = a.get("title", "").strip()
-    relative_link = a.get("href", "")
+    a = article.css_first("h3 a")
+    title = (a.attributes.get("title") or "").strip()
+    relative_link = a.attributes.get("href") or ""
     product_link = urljoin(page_base_url, relative_link)
-    price_tag = article.find("p", class_="price_color")
-    price = price_tag.text.strip() if price_tag else ""
-    availability_tag = article.find("p", class_="instock availability")
-    availability = availability_tag.text.strip() if availability_tag else ""
-    rating_p = article.find("p", class_="star-rating")
-    rating_class = rating_p.get("class", []) if rating_p else []
-    rating = [c for c in rating_class if c != "star-rating"]
-    rating = rating[0] if rating else ""
-    img_tag = article.find("img")
-    img_src = img_tag.get("src", "") if img_tag else ""
+    price = txt(article, "p.price_color")
+    availability = txt(article, "p.instock.availability")
+    rating_p = article.css_first("p.star-rating")
+    rating_class = (rating_p.attributes.get("class") or "").split() if rating_p else []
+    # first class that isn't 'star-rating', with no intermediate list
+    rating = next((c for c in rating_class if c != "star-rating"), "")
+    img_tag = article.css_first("img")
+    img_src = (img_tag.attributes.get("src") or "") if img_tag else ""
     img_url = urljoin(page_base_url, img_src)
     return {
         "title": title,
@@ -91,48 +121,57 @@ def parse_list_item(article, page_base_url):
     }
 
 
-def parse_product_page(product_url):
+def parse_product_page(html, final_url):
     """Return dict with category, description and product info table fields."""
-    soup, final_url = get_soup_and_url(product_url)
-    if soup is None:
-        logging.error(f"Unable to fetch product page: {product_url}")
-        return {}
+    tree = HTMLParser(html)
     try:
         # category from breadcrumb - use text of 3rd breadcrumb item if present
         category = None
-        breadcrumbs = soup.select("ul.breadcrumb li a")
+        breadcrumbs = tree.css("ul.breadcrumb li a")
         if len(breadcrumbs) >= 3:
-            category = breadcrumbs[2].text.strip()
+            category = breadcrumbs[2].text().strip()
 
         desc = ""
-        desc_tag = soup.select_one("#product_description")
+        desc_tag = tree.css_first("#product_description")
         if desc_tag:
-            p = desc_tag.find_next_sibling("p")
-            if p:
-                desc = p.text.strip()
+            # description is the first <p> sibling after the header div
+            p = desc_tag.next
+            while p is not None and p.tag != "p":
+                p = p.next
+            if p is not None:
+                desc = p.text().strip()
 
         info = {}
-        table = soup.find("table", class_="table table-striped")
-        if table:
-            for row in table.find_all("tr"):
-                th = row.find("th").text.strip()
-                td = row.find("td").text.strip()
-                info[th] = td
+        for row in tree.css("table.table-striped tr"):
+            th = txt(row, "th")
+            if th:
+                info[th] = txt(row, "td")
 
         # return final_url as well (in case of redirects)
         return {"category": category, "description": desc, **info, "fetched_url": final_url}
     except Exception as e:
-        logging.error("Error parsing product page %s: %s", product_url, e)
+        logging.error("Error parsing product page %s: %s", final_url, e)
         logging.error(traceback.format_exc())
         return {}
 
 
-def safe_write_json_partial(all_books):
-    """Write partial results to JSON safely (atomic write)."""
-    tmp = RAW_JSON.with_suffix(".tmp")
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(all_books, f, ensure_ascii=False, indent=2)
-    tmp.replace(RAW_JSON)
+def load_jsonl_log():
+    """Read previously scraped items back from the JSONL log, skipping a
+    possibly half-written last line from a crash."""
+    items = []
+    with open(RAW_JSONL, "rb") as f:
+        for line in f:
+            try:
+                items.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                logging.warning("Skipping malformed JSONL line (interrupted write?)")
+    return items
+
+
+def write_raw_parquet(all_books):
+    if not all_books:
+        return
+    pq.write_table(pa.Table.from_pylist(all_books, schema=RAW_SCHEMA), RAW_PARQUET)
 
 
 def safe_write_csv(all_books):
@@ -146,66 +185,89 @@ def safe_write_csv(all_books):
             writer.writerow(row)
 
 
-def scrape_all(max_pages=1000):
+async def collect_list_items(session, semaphore, max_pages):
+    """Fetch listing pages in concurrent batches until one is missing/empty;
+    return the parsed list-item dicts."""
+    items = []
     page = 1
+    done = False
+    while not done and page <= max_pages:
+        batch = [
+            urljoin(BASE, f"catalogue/page-{p}.html")
+            for p in range(page, min(page + CONCURRENCY, max_pages + 1))
+        ]
+        logging.info(f"Fetching listing pages {page}-{page + len(batch) - 1}...")
+        results = await asyncio.gather(*(fetch(session, u, semaphore) for u in batch))
+        for url, (final_url, html) in zip(batch, results):
+            if html is None:
+                logging.warning(f"Stopping: could not fetch listing page {url}")
+                done = True
+                break
+            articles = HTMLParser(html).css("article.product_pod")
+            if not articles:
+                logging.info("No product pods on page - finishing pagination.")
+                done = True
+                break
+            items.extend(parse_list_item(art, final_url or BASE) for art in articles)
+        page += len(batch)
+    return items
+
+
+async def scrape(max_pages=1000):
     all_books = []
     logging.info("Starting scrape loop...")
-    # Try to load existing partial results if present so we can resume
-    if RAW_JSON.exists():
+    # Try to load existing partial results if present so we can resume.
+    # The log is append-only, so resumed items never get rewritten.
+    if RAW_JSONL.exists():
         try:
-            with open(RAW_JSON, "r", encoding="utf-8") as f:
-                all_books = json.load(f)
+            all_books = load_jsonl_log()
             logging.info(f"Loaded {len(all_books)} previously scraped items (resuming).")
         except Exception:
-            logging.warning("Failed to load existing raw json - starting fresh.")
-
-    while page <= max_pages:
-        page_url = urljoin(BASE, f"catalogue/page-{page}.html")
-        logging.info(f"Fetching page {page}: {page_url}")
-        soup, page_final_url = get_soup_and_url(page_url)
-        if soup is None:
-            logging.warning(f"Stopping: could not fetch listing page {page_url}")
-            break
-
-        articles = soup.select("article.product_pod")
-        if not articles:
-            logging.info("No product pods on page - finishing pagination.")
-            break
-
-        for art in articles:
-            try:
-                item = parse_list_item(art, page_final_url or BASE)
-                # Visit product page to enrich data (category, description, UPC)
-                detail = parse_product_page(item["product_page_url"])
-                item.update(detail)
+            all_books = []
+            logging.warning("Failed to load existing raw jsonl - starting fresh.")
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit=CONCURRENCY, keepalive_timeout=30)
+    log_fp = open(RAW_JSONL, "ab")
+    try:
+        async with aiohttp.ClientSession(connector=connector, headers=HEADERS) as session:
+            items = await collect_list_items(session, semaphore, max_pages)
+            logging.info(f"Found {len(items)} products on listing pages.")
+
+            async def enrich(item):
+                # Visit the product page to enrich data (category, description, UPC);
+                # fetch failures leave the listing-level fields intact.
+                final_url, html = await fetch(session, item["product_page_url"], semaphore)
+                if html is None:
+                    logging.error(f"Unable to fetch product page: {item['product_page_url']}")
+                else:
+                    item.update(parse_product_page(html, final_url))
+                return item
+
+            # append each result to the JSONL log as it arrives: O(1) per item,
+            # and every completed line survives a crash
+            for task in asyncio.as_completed([enrich(item) for item in items]):
+                item = await task
                 all_books.append(item)
-                # polite pause between product page requests
-                time.sleep(random.uniform(0.4, 1.2))
-            except Exception as e:
-                logging.error(f"Error while processing an article on page {page}: {e}")
-                logging.error(traceback.format_exc())
-            # persist partial progress every N items
-            if len(all_books) % 20 == 0:
-                safe_write_json_partial(all_books)
-
-        page += 1
-        # polite pause between pages
-        time.sleep(random.uniform(0.8, 2.5))
-
-    # final save
-    safe_write_json_partial(all_books)
-    safe_write_csv(all_books)
-    logging.info(f"Scrape finished. Total items: {len(all_books)}")
-    logging.info(f"Files written: {RAW_JSON} , {RAW_CSV}")
+                log_fp.write(orjson.dumps(item))
+                log_fp.write(b"\n")
+                log_fp.flush()
+    finally:
+        # final save (also runs on KeyboardInterrupt so progress is kept)
+        log_fp.close()
+        write_raw_parquet(all_books)
+        safe_write_csv(all_books)
+        logging.info(f"Scrape finished. Total items: {len(all_books)}")
+        logging.info(f"Files written: {RAW_JSONL} , {RAW_PARQUET} , {RAW_CSV}")
+
+
+def scrape_all(max_pages=1000):
+    asyncio.run(scrape(max_pages))
 
 
 if __name__ == "__main__":
     try:
         scrape_all()
     except KeyboardInterrupt:
-        logging.warning("Interrupted by user, saving partial results...")
-        # if interrupted, ensure partial write
-        if 'all_books' in locals():
-            safe_write_json_partial(all_books)
-            safe_write_csv(all_books)
+        logging.warning("Interrupted by user - partial results were saved.")
         raise
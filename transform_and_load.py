@@ -1,22 +1,33 @@
 """
-Load data/raw_books.json, clean it, write:
+Load the raw scrape output (parquet/jsonl, or legacy raw_books.json), clean it, write:
  - data/books_clean.parquet
  - data/books.db (sqlite) with table 'books'
 """
-import json
+import ijson
+import orjson
 import re
 from pathlib import Path
-import pandas as pd
+import polars as pl
 import sqlite3
 import logging
 
 DATA_DIR = Path("data")
+RAW_PARQUET = DATA_DIR / "raw_books.parquet"
+RAW_JSONL = DATA_DIR / "raw_books.jsonl"
 RAW_JSON = DATA_DIR / "raw_books.json"
 PARQUET_FILE = DATA_DIR / "books_clean.parquet"
 DB_PATH = DATA_DIR / "books.db"
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Cleaned column layout, in output order.
+CLEAN_COLS = ["title", "product_page_url", "category", "price", "availability", "rating", "description", "image_url"]
+
+# Compiled once at import; the extracts run in a single pass over each column.
+# (No escaping needed for '.' inside a character class.)
+_PRICE_RE = re.compile(r"([\d.,]+)")
+_AVAIL_RE = re.compile(r"(\d+)")
+
 RATING_MAP = {
     "One": 1,
     "Two": 2,
@@ -27,81 +38,129 @@ RATING_MAP = {
     "": None
 }
 
-def parse_price(price_text):
-    """Convert price string like '£51.77' to float 51.77, or None if invalid."""
-    if not price_text:
-        return None
-    m = re.search(r"[\d\.,]+", price_text)
-    if not m:
-        return None
-    # Replace comma with empty (if any) then float
-    return float(m.group(0).replace(",", ""))
-
-def parse_availability(avail_text):
-    """Extract number of available items from string like 'In stock (22 available)'."""
-    if not avail_text:
-        return None
-    m = re.search(r"(\d+)", avail_text)
-    if m:
-        return int(m.group(1))
-    return 0  # Assume 0 if not found
-
-def rating_word_to_int(rating_word):
-    """Convert rating word like 'Three' to integer 3."""
-    return RATING_MAP.get(rating_word, None)
-
-def clean_data(df):
-    """Clean and transform the DataFrame."""
+def scan_legacy_json(chunk_size=10_000):
+    """Stream the legacy array-of-dicts JSON with ijson.
+
+    Yields one record at a time and frames them in chunks, so peak memory is
+    O(chunk_size) rather than the whole file - matters once a scrape grows
+    past what json.load comfortably materializes.
+    """
+    frames = []
+    chunk = []
+    with open(RAW_JSON, "rb") as f:
+        for record in ijson.items(f, "item"):
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                frames.append(pl.DataFrame(chunk))
+                chunk = []
+    if chunk:
+        frames.append(pl.DataFrame(chunk))
+    if not frames:
+        return pl.LazyFrame()
+    # diagonal concat tolerates records missing some fields
+    return pl.concat(frames, how="diagonal").lazy()
+
+def scan_jsonl_log():
+    """Read the JSONL log tolerantly, one orjson line at a time.
+
+    The log may end in a half-written line if the scrape crashed, and
+    scan_ndjson's ignore_errors only covers type mismatches, not broken
+    JSON syntax - so skip undecodable lines here, the same way
+    scrape.load_jsonl_log does on resume.
+    """
+    items = []
+    with open(RAW_JSONL, "rb") as f:
+        for line in f:
+            try:
+                items.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                logging.warning("Skipping malformed JSONL line (interrupted write?)")
+    if not items:
+        return pl.LazyFrame()
+    # scan every record so keys that only appear late still make the schema
+    return pl.from_dicts(items, infer_schema_length=None).lazy()
+
+def scan_raw():
+    """Return a LazyFrame over whichever raw output scrape.py produced."""
+    if RAW_PARQUET.exists():
+        logging.info("Scanning raw parquet data...")
+        return pl.scan_parquet(RAW_PARQUET)
+    if RAW_JSONL.exists():
+        logging.info("Reading raw JSONL log...")
+        return scan_jsonl_log()
+    logging.info("Streaming legacy raw JSON data...")
+    return scan_legacy_json()
+
+def clean_data(lf):
+    """Clean and transform the raw LazyFrame into the final column layout.
+
+    The whole pipeline (dedup, extracts, casts, projection) is planned
+    lazily and collected in one streaming pass.
+    """
     logging.info("Cleaning data...")
-
-    # Price
-    df['price'] = df['price_text'].apply(parse_price)
-
-    # Availability
-    df['availability'] = df["availability_text"].apply(parse_availability)
-
-    # Rating
-    df['rating'] = df['rating_text'].apply(rating_word_to_int)
-
-    # Lowercase title, strip whitespace
-    df['title'] = df['title'].astype(str).str.strip().str.lower()
-
-    # Ensure product_page_url exists
-    df = df.dropna(subset=['product_page_url'])
-
-    # Deduplicate by product_page_url
-    df = df.drop_duplicates(subset=['product_page_url'])
-
-    # Rearrange columns and fill missing category
-    cols = ["title", "product_page_url", "category", "price", "availability", "rating", "description", "image_url"]
-    existing_cols = [col for col in cols if col in df.columns]
-    df = df[existing_cols].reset_index(drop=True)
-    return df
+    lf = (
+        lf
+        # Ensure product_page_url exists, deduplicate by it
+        .drop_nulls("product_page_url")
+        .unique(subset="product_page_url", keep="first")
+        .with_columns(
+            # Price: numeric part of '£51.77', thousands separators dropped
+            price=pl.col("price_text").str.extract(_PRICE_RE.pattern, 1)
+                .str.replace_all(",", "", literal=True)
+                .cast(pl.Float32, strict=False),
+            # Availability: first run of digits, missing/unparseable as 0
+            availability=pl.col("availability_text").str.extract(_AVAIL_RE.pattern, 1)
+                .cast(pl.Int32, strict=False).fill_null(0),
+            # Rating: dict lookup, unknown words become null
+            rating=pl.col("rating_text").replace_strict(RATING_MAP, default=None)
+                .cast(pl.Int8),
+            # Lowercase title, strip whitespace
+            title=pl.col("title").cast(pl.Utf8).str.strip_chars().str.to_lowercase(),
+        )
+    )
+    schema_names = lf.collect_schema().names()
+    if "category" in schema_names:
+        # Dictionary-encode: ~50 distinct categories across ~1000 rows, so
+        # the column becomes small integer codes over one string table and
+        # parquet stores it dictionary-encoded as well
+        lf = lf.with_columns(pl.col("category").cast(pl.Categorical))
+    # Rearrange columns, tolerating fields a partial scrape never produced
+    existing_cols = [col for col in CLEAN_COLS if col in schema_names]
+    return lf.select(existing_cols).collect(engine="streaming")
 
 def main():
-    logging.info("Loading raw JSON data...")
-    with open(RAW_JSON, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    df = pd.DataFrame(data)
-    logging.info(f"Loaded {len(df)} records.")
-
-    df_clean = clean_data(df)
+    df_clean = clean_data(scan_raw())
     logging.info(f"Cleaned data has {len(df_clean)} records.")
 
     try:
         logging.info(f"Saving cleaned data to {PARQUET_FILE}...")
-        df_clean.to_parquet(PARQUET_FILE, index=False)
+        df_clean.write_parquet(PARQUET_FILE)
         logging.info(f"Wrote cleaned parquet to {PARQUET_FILE}")
     except Exception as e:
         logging.warning(f"Error saving parquet file: ({e}), Saving as CSV instead.")
-        df_clean.to_csv(DATA_DIR / "books_clean.csv", index=False)
+        df_clean.write_csv(DATA_DIR / "books_clean.csv")
 
     #Write to SQLite
     logging.info(f"Writing data to SQLite database at {DB_PATH}...")
     conn = sqlite3.connect(DB_PATH)
-    df_clean.to_sql("books", conn, if_exists="replace", index=False)
-
+    # WAL + synchronous=OFF during the bulk load: one fsync for the whole
+    # insert instead of one per row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    columns = df_clean.columns
+    type_map = {"price": "REAL", "availability": "INTEGER", "rating": "INTEGER"}
+    ddl = ", ".join(f'"{c}" {type_map.get(c, "TEXT")}' for c in columns)
+    placeholders = ",".join("?" * len(columns))
+
+    conn.execute("BEGIN")
+    conn.execute("DROP TABLE IF EXISTS books")
+    conn.execute(f"CREATE TABLE books ({ddl})")
+    # Polars rows() yields native Python scalars with None for nulls
+    conn.executemany(f"INSERT INTO books VALUES ({placeholders})", df_clean.rows())
+    conn.execute("COMMIT")
+
+    # indexes after the bulk insert so they are built once, not maintained per row
     cur = conn.cursor()
     cur.execute("CREATE INDEX IF NOT EXISTS idx_category ON books(category)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_price ON books(price)")
@@ -111,4 +170,4 @@ def main():
 
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
+